@@ -1,4 +1,5 @@
 #include "utils.hpp"
+#include "postings.hpp"
 
 #include <iostream>
 #include <string>
@@ -9,9 +10,13 @@
 #include <set>
 #include <thread>
 #include <chrono>
+#include <memory>
 #include <pqxx/pqxx>
 #include <hiredis/hiredis.h>
 #include <rocksdb/db.h>
+#include <rocksdb/filter_policy.h>
+#include <rocksdb/table.h>
+#include <rocksdb/write_batch.h>
 #include <gumbo.h>
 
 using namespace indexer;
@@ -61,6 +66,12 @@ int main() {
     rocksdb::DB* db;
     rocksdb::Options options;
     options.create_if_missing = true;
+    // Bloom filters and compression are baked into SSTs at write time, so they are set here;
+    // the ranker's point lookups by term rely on the filters to skip irrelevant files
+    rocksdb::BlockBasedTableOptions table_options;
+    table_options.filter_policy.reset(rocksdb::NewBloomFilterPolicy(10));
+    options.table_factory.reset(rocksdb::NewBlockBasedTableFactory(table_options));
+    options.compression = rocksdb::kLZ4Compression;
     rocksdb::Status status = rocksdb::DB::Open(options, ROCKSDB_PATH, &db);
     if (!status.ok()) {
         std::cerr << "RocksDB Open failed: " << status.ToString() << std::endl;
@@ -69,6 +80,54 @@ int main() {
         return 1;
     }
 
+    // Refuse an index written in another posting list format; stamp a new one
+    std::string index_format;
+    status = db->Get(rocksdb::ReadOptions(), INDEX_FORMAT_KEY, &index_format);
+    if (status.IsNotFound()) {
+        std::unique_ptr<rocksdb::Iterator> it(db->NewIterator(rocksdb::ReadOptions()));
+        it->SeekToFirst();
+        if (it->Valid()) {
+            index_format = "(none)";
+        } else {
+            index_format = INDEX_FORMAT_VERSION;
+            status = db->Put(rocksdb::WriteOptions(), INDEX_FORMAT_KEY, index_format);
+        }
+    }
+    if (!status.ok()) {
+        std::cerr << "Failed to check index format: " << status.ToString() << std::endl;
+        delete db;
+        delete C;
+        redisFree(redis);
+        return 1;
+    }
+    if (index_format != INDEX_FORMAT_VERSION) {
+        std::cerr << "Index at " << ROCKSDB_PATH << " has format " << index_format
+                  << ", expected " << INDEX_FORMAT_VERSION << "; rebuild it" << std::endl;
+        delete db;
+        delete C;
+        redisFree(redis);
+        return 1;
+    }
+
+    // 4. Load corpus stats: N and the total length for avgdl, kept as running
+    // totals from here on. The ranker derives IDF from N at query time.
+    long indexed_docs = 0;
+    long long total_length = 0;
+    try {
+        pqxx::work W(*C);
+        pqxx::row stats = W.exec1("SELECT COUNT(*), COALESCE(SUM(doc_length), 0) FROM documents WHERE doc_length > 0");
+        indexed_docs = stats[0].as<long>();
+        total_length = stats[1].as<long long>();
+        W.commit();
+    } catch (const std::exception &e) {
+        // Carrying on from zero would overwrite the published stats with bogus values
+        std::cerr << "Failed to load corpus stats: " << e.what() << std::endl;
+        delete db;
+        delete C;
+        redisFree(redis);
+        return 1;
+    }
+
     while (true) {
         // A. Pop from Queue
         redisReply *reply = (redisReply*)redisCommand(redis, "BLPOP indexing_queue 0");
@@ -97,10 +156,11 @@ int main() {
         try {
             // B. Get Metadata
             pqxx::work W(*C);
-            pqxx::row row = W.exec_params1("SELECT file_path, \"offset\", length FROM documents WHERE id = $1", doc_id);
+            pqxx::row row = W.exec_params1("SELECT file_path, \"offset\", length, COALESCE(doc_length, 0) FROM documents WHERE id = $1", doc_id);
             std::string file_path = WARC_BASE_PATH + row[0].as<std::string>();
             long offset = row[1].as<long>();
             long length = row[2].as<long>();
+            long previous_length = row[3].as<long>();
             W.commit();
 
             // C. Read WARC Record
@@ -143,28 +203,21 @@ int main() {
             std::vector<std::string> tokens = tokenize(plain_text);
             std::set<std::string> unique_tokens(tokens.begin(), tokens.end()); // Simple boolean index for now
 
+            // Each posting carries the doc length so the ranker can score without Postgres
+            uint32_t doc_length = static_cast<uint32_t>(tokens.size());
+            long total_docs = indexed_docs - (previous_length > 0 ? 1 : 0) + (tokens.empty() ? 0 : 1);
+            long long new_total_length = total_length - previous_length + static_cast<long long>(tokens.size());
             for (const auto& token : unique_tokens) {
                 std::string current_list;
                 status = db->Get(rocksdb::ReadOptions(), token, &current_list);
                 
-                std::set<std::string> doc_ids;
+                std::vector<Posting> postings;
                 if (status.ok() && !current_list.empty()) {
-                    std::stringstream ss(current_list);
-                    std::string id;
-                    while (std::getline(ss, id, ',')) {
-                        doc_ids.insert(id);
-                    }
+                    postings = decode_postings(current_list);
                 }
                 
-                std::string doc_id_str = std::to_string(doc_id);
-                if (doc_ids.find(doc_id_str) == doc_ids.end()) {
-                    doc_ids.insert(doc_id_str);
-                    current_list = "";
-                    for (auto it = doc_ids.begin(); it != doc_ids.end(); ++it) {
-                        if (it != doc_ids.begin()) current_list += ",";
-                        current_list += *it;
-                    }
-                    db->Put(rocksdb::WriteOptions(), token, current_list);
+                if (upsert_posting(postings, static_cast<uint32_t>(doc_id), doc_length)) {
+                    db->Put(rocksdb::WriteOptions(), token, encode_postings(postings));
                 }
             }
 
@@ -173,6 +226,15 @@ int main() {
             W2.exec_params("UPDATE documents SET doc_length = $1, title = $2, snippet = $3 WHERE id = $4", 
                            tokens.size(), title, snippet, doc_id);
             W2.commit();
+            indexed_docs = total_docs;
+            total_length = new_total_length;
+
+            // G. Publish corpus stats so the ranker can read them with a single get
+            rocksdb::WriteBatch stats_batch;
+            double avgdl = indexed_docs > 0 ? static_cast<double>(total_length) / indexed_docs : 0.0;
+            stats_batch.Put(STATS_TOTAL_DOCS_KEY, std::to_string(indexed_docs));
+            stats_batch.Put(STATS_AVGDL_KEY, std::to_string(avgdl));
+            db->Write(rocksdb::WriteOptions(), &stats_batch);
             
             std::cout << "Indexed " << tokens.size() << " words for Doc " << doc_id << std::endl;
 
@@ -0,0 +1,76 @@
+#include "postings.hpp"
+
+#include <algorithm>
+#include <stdexcept>
+
+namespace indexer {
+
+namespace {
+
+const size_t RECORD_SIZE = 2 * sizeof(uint32_t);
+
+void put_u32(std::string& out, uint32_t v) {
+    out.push_back(static_cast<char>(v & 0xFF));
+    out.push_back(static_cast<char>((v >> 8) & 0xFF));
+    out.push_back(static_cast<char>((v >> 16) & 0xFF));
+    out.push_back(static_cast<char>((v >> 24) & 0xFF));
+}
+
+uint32_t get_u32(const unsigned char* p) {
+    return static_cast<uint32_t>(p[0]) |
+           (static_cast<uint32_t>(p[1]) << 8) |
+           (static_cast<uint32_t>(p[2]) << 16) |
+           (static_cast<uint32_t>(p[3]) << 24);
+}
+
+void check_size(const std::string& value) {
+    if (value.size() % RECORD_SIZE != 0) {
+        throw std::runtime_error("Corrupt posting list: unexpected size " + std::to_string(value.size()));
+    }
+}
+
+} // namespace
+
+std::vector<Posting> decode_postings(const std::string& value) {
+    check_size(value);
+
+    std::vector<Posting> postings;
+    postings.reserve(value.size() / RECORD_SIZE);
+    const unsigned char* p = reinterpret_cast<const unsigned char*>(value.data());
+    uint32_t doc_id = 0;
+    for (size_t i = 0; i < value.size(); i += RECORD_SIZE) {
+        doc_id += get_u32(p + i);
+        postings.push_back({doc_id, get_u32(p + i + 4)});
+    }
+    return postings;
+}
+
+std::string encode_postings(const std::vector<Posting>& postings) {
+    std::string out;
+    out.reserve(postings.size() * RECORD_SIZE);
+
+    uint32_t prev_doc_id = 0;
+    for (const auto& posting : postings) {
+        if (posting.doc_id < prev_doc_id) {
+            throw std::runtime_error("Postings must be sorted by doc_id");
+        }
+        put_u32(out, posting.doc_id - prev_doc_id);
+        put_u32(out, posting.doc_length);
+        prev_doc_id = posting.doc_id;
+    }
+    return out;
+}
+
+bool upsert_posting(std::vector<Posting>& postings, uint32_t doc_id, uint32_t doc_length) {
+    auto it = std::lower_bound(postings.begin(), postings.end(), doc_id,
+                               [](const Posting& p, uint32_t id) { return p.doc_id < id; });
+    if (it != postings.end() && it->doc_id == doc_id) {
+        if (it->doc_length == doc_length) return false;
+        it->doc_length = doc_length;
+        return true;
+    }
+    postings.insert(it, {doc_id, doc_length});
+    return true;
+}
+
+} // namespace indexer
@@ -0,0 +1,44 @@
+#ifndef INDEXER_POSTINGS_HPP
+#define INDEXER_POSTINGS_HPP
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+namespace indexer {
+
+// Corpus stats stored next to the posting lists. Terms are alphanumeric only,
+// so these keys can never collide with one.
+const char* const STATS_TOTAL_DOCS_KEY = "__stats:total_docs";
+const char* const STATS_AVGDL_KEY = "__stats:avgdl";
+
+// Version of the posting list encoding below. The indexer stamps it on a new index
+// and both the indexer and the ranker refuse an index that lacks it, so a value in an
+// older encoding is never misread (a size check alone cannot tell them apart).
+const char* const INDEX_FORMAT_KEY = "__stats:format";
+const char* const INDEX_FORMAT_VERSION = "2";
+
+// One entry of a term's posting list. The document length is stored inline
+// so the ranker does not need a Postgres lookup to compute BM25.
+struct Posting {
+    uint32_t doc_id;
+    uint32_t doc_length;
+};
+
+// Decode a RocksDB posting list value: packed little-endian
+// (uint32 doc_id_delta, uint32 doc_length) records, sorted by doc_id. Each doc_id is stored as the gap from the
+// previous one (the first from 0), which the ranker undoes with a single
+// cumulative sum.
+std::vector<Posting> decode_postings(const std::string& value);
+
+// Encode postings (sorted by doc_id) into a RocksDB posting list value.
+// Throws if the postings are not sorted by doc_id.
+std::string encode_postings(const std::vector<Posting>& postings);
+
+// Insert or update the posting for doc_id, keeping the list sorted by doc_id.
+// Returns true if the list changed.
+bool upsert_posting(std::vector<Posting>& postings, uint32_t doc_id, uint32_t doc_length);
+
+} // namespace indexer
+
+#endif // INDEXER_POSTINGS_HPP
@@ -0,0 +1,99 @@
+#include "../src/postings.hpp"
+#include <iostream>
+#include <cstdlib>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+// Simple assertion macro
+#define ASSERT(condition, message) \
+    do { \
+        if (!(condition)) { \
+            std::cerr << "Assertion failed: " << (message) << "\n" \
+                      << "File: " << __FILE__ << ", Line: " << __LINE__ << std::endl; \
+            std::exit(EXIT_FAILURE); \
+        } \
+    } while (false)
+
+// --- Test: encode/decode ---
+void test_postings_roundtrip() {
+    std::vector<indexer::Posting> postings = {{1, 120}, {7, 80}, {70000, 5}};
+    std::string value = indexer::encode_postings(postings);
+    ASSERT(value.size() == 24, "Each posting should take 8 bytes");
+
+    auto decoded = indexer::decode_postings(value);
+    ASSERT(decoded.size() == 3, "Should decode 3 postings");
+    ASSERT(decoded[2].doc_id == 70000, "Third doc_id should be 70000");
+    ASSERT(decoded[2].doc_length == 5, "Third doc_length should be 5");
+    std::cout << "test_postings_roundtrip passed" << std::endl;
+}
+
+void test_postings_little_endian() {
+    std::string value = indexer::encode_postings({{1, 2}});
+    ASSERT(value == std::string("\x01\x00\x00\x00\x02\x00\x00\x00", 8),
+           "Should be packed little-endian uint32 pairs");
+    std::cout << "test_postings_little_endian passed" << std::endl;
+}
+
+void test_postings_delta_encoded() {
+    std::string value = indexer::encode_postings({{5, 1}, {9, 1}});
+    ASSERT(value.substr(8, 4) == std::string("\x04\x00\x00\x00", 4), "Second doc_id should be stored as the gap from the first");
+    ASSERT(indexer::decode_postings(value)[1].doc_id == 9, "Decoding should restore the absolute doc_id");
+    std::cout << "test_postings_delta_encoded passed" << std::endl;
+}
+
+void test_encode_postings_rejects_unsorted() {
+    bool threw = false;
+    try {
+        indexer::encode_postings({{9, 1}, {5, 1}});
+    } catch (const std::runtime_error&) {
+        threw = true;
+    }
+    ASSERT(threw, "Should reject postings that are not sorted by doc_id");
+    std::cout << "test_encode_postings_rejects_unsorted passed" << std::endl;
+}
+
+void test_decode_postings_rejects_corrupt() {
+    bool threw = false;
+    try {
+        indexer::decode_postings("abcdefg");
+    } catch (const std::runtime_error&) {
+        threw = true;
+    }
+    ASSERT(threw, "Should reject a value that is not a whole number of records");
+    std::cout << "test_decode_postings_rejects_corrupt passed" << std::endl;
+}
+
+// --- Test: upsert_posting ---
+void test_upsert_posting_keeps_order() {
+    std::vector<indexer::Posting> postings = {{2, 10}, {9, 10}};
+    ASSERT(indexer::upsert_posting(postings, 5, 30), "Inserting a new doc should change the list");
+    ASSERT(postings.size() == 3, "Should have 3 postings");
+    ASSERT(postings[1].doc_id == 5, "New doc should be inserted in doc_id order");
+    std::cout << "test_upsert_posting_keeps_order passed" << std::endl;
+}
+
+void test_upsert_posting_updates_length() {
+    std::vector<indexer::Posting> postings = {{2, 10}};
+    ASSERT(!indexer::upsert_posting(postings, 2, 10), "Same length should be a no-op");
+    ASSERT(indexer::upsert_posting(postings, 2, 40), "New length should change the list");
+    ASSERT(postings.size() == 1 && postings[0].doc_length == 40, "Length should be updated in place");
+    std::cout << "test_upsert_posting_updates_length passed" << std::endl;
+}
+
+int main() {
+    try {
+        test_postings_roundtrip();
+        test_postings_little_endian();
+        test_postings_delta_encoded();
+        test_encode_postings_rejects_unsorted();
+        test_decode_postings_rejects_corrupt();
+        test_upsert_posting_keeps_order();
+        test_upsert_posting_updates_length();
+        std::cout << "All posting tests passed!" << std::endl;
+    } catch (const std::exception& e) {
+        std::cerr << "Test failed with exception: " << e.what() << std::endl;
+        return 1;
+    }
+    return 0;
+}
@@ -1,35 +1,82 @@
-from flask import Flask, jsonify, request
-from engine import Ranker
-import time
 import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Request threads only enqueue log records; a single listener thread formats and
+# writes them, so logging never blocks a request on the stderr lock
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger('ranker')
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.propagate = False
+_log_listener = None
+
+def start_log_listener():
+    """Starts the thread draining log_queue. Threads do not survive fork, so
+    preforking servers call this again in each worker (see gunicorn.conf.py)."""
+    global _log_listener
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(message)s"))
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+
+def stop_log_listener():
+    """Flushes pending records and stops the listener thread."""
+    if _log_listener:
+        _log_listener.stop()
+
+start_log_listener()
+atexit.register(stop_log_listener)
+
+# Imported after the logger is set up so its import-time warnings are not lost
+from flask import Flask, jsonify, request
+from engine import Ranker, start_parallel_runtime
 
 app = Flask(__name__)
 
-# Initialize Ranker (Global Singleton)
-ranker = None
+# Upper bound on queries per /search_batch request
+MAX_BATCH_QUERIES = 100
+
+# Ranker (Global Singleton), built on first use
+_ranker = None
+_ranker_lock = threading.Lock()
+
+def get_ranker():
+    """Returns the shared Ranker, constructing it once even under concurrent requests."""
+    global _ranker
+    if _ranker:
+        return _ranker
+    with _ranker_lock:
+        if _ranker is None:
+            ranker = Ranker()
+            atexit.register(ranker.close)
+            _ranker = ranker
+    return _ranker
+
+# Build it at import when possible, so a preloading server (see gunicorn.conf.py)
+# opens RocksDB once in the master and workers inherit it
 try:
-    ranker = Ranker()
-    atexit.register(ranker.close)
+    get_ranker()
 except Exception as e:
-    print(f"Failed to initialize Ranker: {e}")
+    logger.error("Failed to initialize Ranker: %s", e)
 
 @app.route('/health')
 def health():
-    status = "healthy" if ranker else "degraded"
+    status = "healthy" if _ranker else "degraded"
     return jsonify({"status": status, "service": "ranker"})
 
 @app.route('/search')
 def search():
-    global ranker
-    if not ranker:
-        # Fallback for dev/restart if before_first_request didn't fire or failed
-        try:
-            ranker = Ranker()
-        except Exception as e:
-            return jsonify({"error": f"Ranker not initialized: {str(e)}"}), 500
+    try:
+        ranker = get_ranker()
+    except Exception as e:
+        return jsonify({"error": f"Ranker not initialized: {str(e)}"}), 500
 
     query = request.args.get('q', '').lower()
-    print(f"Received query: {query}")
+    logger.info("Received query: %s", query)
     
     start_time = time.time()
     results = ranker.search(query)
@@ -44,6 +91,44 @@ def search():
         }
     })
 
+@app.route('/search_batch', methods=['POST'])
+def search_batch():
+    try:
+        ranker = get_ranker()
+    except Exception as e:
+        return jsonify({"error": f"Ranker not initialized: {str(e)}"}), 500
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    queries = body.get('queries')
+    k = body.get('k', 10)
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "'queries' must be a list of strings"}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({"error": f"At most {MAX_BATCH_QUERIES} queries per batch"}), 400
+    if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+        return jsonify({"error": "'k' must be a positive integer"}), 400
+
+    queries = [q.lower() for q in queries]
+    logger.info("Received batch of %d queries", len(queries))
+
+    start_time = time.time()
+    batch_results = ranker.search_batch(queries, k)
+    duration_ms = (time.time() - start_time) * 1000
+
+    return jsonify({
+        "results": [
+            {"query": query, "results": results}
+            for query, results in zip(queries, batch_results)
+        ],
+        "meta": {
+            "count": len(queries),
+            "latency_ms": round(duration_ms, 2)
+        }
+    })
+
 if __name__ == '__main__':
+    start_parallel_runtime()
     # host='0.0.0.0' is CRITICAL for Docker networking
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
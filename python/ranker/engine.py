@@ -1,8 +1,16 @@
+import logging
 import os
 import re
+import threading
 import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
-from collections import defaultdict
+
+# Handlers are attached by the app (see app.py); engine only emits records
+logger = logging.getLogger('ranker')
 
 # Try to import our custom C++ extension
 try:
@@ -10,11 +18,225 @@ try:
     ROCKSDB_AVAILABLE = True
 except ImportError:
     ROCKSDB_AVAILABLE = False
-    print("WARNING: rocksdb_client extension not available. Using Mock Index.")
+    logger.warning("rocksdb_client extension not available. Using Mock Index.")
+
+# Numba is optional; without it scoring falls back to plain NumPy
+try:
+    import numba
+    from numba import njit, prange
+    # Request threads call the kernel concurrently. The 'workqueue' fallback aborts the
+    # process on concurrent use, so only accept a thread-safe layer (tbb or omp)
+    numba.config.THREADING_LAYER = 'threadsafe'
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Posting list value written by the indexer: packed little-endian
+# (doc_id_delta, doc_length) records sorted by doc_id,
+# each id stored as the gap from the previous one
+POSTING_DTYPE = np.dtype([('doc_id_delta', '<u4'), ('doc_length', '<u4')])
+
+# Corpus stats written by the indexer next to the posting lists
+STATS_KEY_PREFIX = b'__stats:'
+STATS_TOTAL_DOCS_KEY = b'__stats:total_docs'
+STATS_AVGDL_KEY = b'__stats:avgdl'
+# Posting list format version, stamped by the indexer (see postings.hpp)
+INDEX_FORMAT_KEY = b'__stats:format'
+INDEX_FORMAT_VERSION = b'2'
+
+# Hot statement prepared once per Postgres session, so searches skip parse/plan
+PREPARE_META_SQL = (
+    "PREPARE get_meta(int[]) AS "
+    "SELECT id, url, title, snippet FROM documents WHERE id = ANY($1)"
+)
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that prepares the ranker's hot statements when it is opened."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        with self.cursor() as cur:
+            cur.execute(PREPARE_META_SQL)
+        self.commit()
+
+# BM25 Constants
+K1 = 1.5
+B = 0.75
+
+
+def posting_records(val):
+    """
+    Views a posting list value as POSTING_DTYPE records without copying.
+    Raises ValueError if the value is not a well-formed posting list.
+    """
+    # Same check as the indexer's decoder: a whole number of records
+    if len(val) % POSTING_DTYPE.itemsize:
+        raise ValueError(f"Corrupt posting list: unexpected size {len(val)}")
+    return np.frombuffer(val, dtype=POSTING_DTYPE)
+
+
+def bm25_idf(total_docs, n_qi):
+    """IDF(q_i) = log( (N - n(q_i) + 0.5) / (n(q_i) + 0.5) + 1 )"""
+    N = max(total_docs, 1) # Avoid division by zero issues if DB is empty
+    return float(np.log((N - n_qi + 0.5) / (n_qi + 0.5) + 1))
+
+
+# ASCII chars that are neither alphanumeric nor whitespace become separators
+_QUERY_TRANS = {i: ' ' for i in range(128) if not (chr(i).isalnum() or chr(i).isspace())}
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9\s]')
+
+
+def tokenize_query(query):
+    """
+    Preprocessing to match Indexer:
+    1. Lowercase
+    2. Replace non-alphanumeric with spaces (the indexer splits on them)
+    3. Split by whitespace
+    4. Filter length >= 3
+    """
+    query = query.lower()
+    if query.isascii():
+        # str.translate runs entirely in C, no regex engine per request
+        query_clean = query.translate(_QUERY_TRANS)
+    else:
+        query_clean = _NON_ALNUM_RE.sub(' ', query)
+    return [t for t in query_clean.split() if len(t) >= 3]
+
+
+def _bm25_numpy(token_offsets, posting_idx_flat, idfs, lens_vec, avgdl, k1, b, scores_vec):
+    """
+    Adds the BM25 contribution of every token into scores_vec (TF=1).
+    Token t owns posting_idx_flat[token_offsets[t]:token_offsets[t + 1]].
+    """
+    for t in range(len(token_offsets) - 1):
+        posting_idx = posting_idx_flat[token_offsets[t]:token_offsets[t + 1]]
+        K = 1 - b + b * lens_vec[posting_idx] / avgdl
+        np.add.at(scores_vec, posting_idx, idfs[t] * (k1 + 1) / (1 + k1 * K))
+
+
+# Queries with fewer postings than this are scored on the calling thread: starting a
+# parallel region per token costs more than it saves on short posting lists
+NUMBA_PARALLEL_MIN_POSTINGS = int(os.environ.get("NUMBA_PARALLEL_MIN_POSTINGS", 100000))
+
+if NUMBA_AVAILABLE:
+    # nogil: request threads score concurrently instead of queueing on the GIL
+    @njit(nogil=True, fastmath=True, cache=True)
+    def _bm25_numba_serial(token_offsets, posting_idx_flat, idfs, lens_vec, avgdl, k1, b, scores_vec):
+        """Compiled equivalent of _bm25_numpy."""
+        for t in range(len(token_offsets) - 1):
+            idf = idfs[t]
+            for j in range(token_offsets[t], token_offsets[t + 1]):
+                i = posting_idx_flat[j]
+                K = 1 - b + b * lens_vec[i] / avgdl
+                scores_vec[i] += idf * (k1 + 1) / (1 + k1 * K)
+
+    @njit(nogil=True, parallel=True, fastmath=True, cache=True)
+    def _bm25_numba_parallel(token_offsets, posting_idx_flat, idfs, lens_vec, avgdl, k1, b, scores_vec):
+        """_bm25_numba_serial with each token's postings split across threads."""
+        for t in range(len(token_offsets) - 1):
+            idf = idfs[t]
+            # A posting list never repeats a doc, so these parallel adds never collide
+            for j in prange(token_offsets[t], token_offsets[t + 1]):
+                i = posting_idx_flat[j]
+                K = 1 - b + b * lens_vec[i] / avgdl
+                scores_vec[i] += idf * (k1 + 1) / (1 + k1 * K)
+
+    def _bm25_numba(token_offsets, posting_idx_flat, idfs, lens_vec, avgdl, k1, b, scores_vec):
+        """Scores in parallel only when the query has enough postings to pay for it."""
+        if posting_idx_flat.size >= NUMBA_PARALLEL_MIN_POSTINGS:
+            kernel = _bm25_numba_parallel
+        else:
+            kernel = _bm25_numba_serial
+        kernel(token_offsets, posting_idx_flat, idfs, lens_vec, avgdl, k1, b, scores_vec)
+
+    bm25_kernel = _bm25_numba
+else:
+    bm25_kernel = _bm25_numpy
+
+
+def start_parallel_runtime():
+    """
+    Starts Numba's threading layer on the calling thread. Call it once per process from
+    the main thread: if a request thread starts the TBB runtime, it blocks interpreter exit.
+    """
+    if NUMBA_AVAILABLE:
+        _bm25_numba_parallel(np.array([0, 1], dtype=np.int64), np.zeros(1, dtype=np.int64),
+                             np.ones(1), np.ones(1), 1.0, K1, B, np.zeros(1))
+
+class PostingCache:
+    """Thread-safe LRU cache of decoded posting lists."""
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+class TermTable:
+    """
+    Read-only in-memory copy of the inverted index in struct-of-arrays form.
+    All posting lists live in flat doc_ids/doc_lengths arrays and term t owns the
+    slice offsets[t]:offsets[t + 1], so a lookup is one dict probe plus two array slices.
+    The arrays are sized up front and filled in place, one posting list at a time.
+    """
+    def __init__(self, max_terms, max_postings):
+        self.term_to_termid = {}
+        self.offsets = np.zeros(max_terms + 1, dtype=np.int64)
+        self.doc_ids = np.empty(max_postings, dtype=np.int64)
+        self.doc_lengths = np.empty(max_postings, dtype=np.float64)
+        self.idfs = np.empty(max_terms, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.term_to_termid)
+
+    def add(self, token, postings, idf):
+        """Appends a term's POSTING_DTYPE records, undoing the doc_id deltas in place."""
+        termid = len(self.term_to_termid)
+        start = self.offsets[termid]
+        end = start + len(postings)
+        np.cumsum(postings['doc_id_delta'], dtype=np.int64, out=self.doc_ids[start:end])
+        self.doc_lengths[start:end] = postings['doc_length']
+        self.offsets[termid + 1] = end
+        self.idfs[termid] = idf
+        self.term_to_termid[token] = termid
+
+    def freeze(self):
+        """Trims the arrays to the terms actually added and makes them read-only."""
+        num_terms = len(self.term_to_termid)
+        self.offsets = self.offsets[:num_terms + 1]
+        self.doc_ids = self.doc_ids[:self.offsets[-1]]
+        self.doc_lengths = self.doc_lengths[:self.offsets[-1]]
+        self.idfs = self.idfs[:num_terms]
+        # Slices are handed to concurrent requests
+        for arr in (self.offsets, self.doc_ids, self.doc_lengths, self.idfs):
+            arr.setflags(write=False)
+
+    def get(self, token):
+        """Returns (doc_ids, doc_lengths, idf) for token, or None if it is not in the table."""
+        termid = self.term_to_termid.get(token)
+        if termid is None:
+            return None
+        start, end = self.offsets[termid], self.offsets[termid + 1]
+        return self.doc_ids[start:end], self.doc_lengths[start:end], float(self.idfs[termid])
 
 class Ranker:
     def __init__(self):
         # 1. Connect to Postgres (Metadata)
+        self.pool = None
+        self._pool_pid = os.getpid()
+        self._pool_lock = threading.Lock()
         try:
             db_host = os.environ.get("DB_HOST", "postgres_service")
             db_name = os.environ.get("DB_NAME", "search_engine")
@@ -24,219 +246,364 @@ class Ranker:
             if not db_user or not db_pass:
                 raise ValueError("DB_USER and DB_PASS environment variables must be set.")
 
-            self.db_conn = psycopg2.connect(
+            # psycopg2 connections must not be shared between request threads,
+            # so each request checks one out of the pool instead.
+            # putconn closes connections beyond minconn, so keep one per request thread
+            # open; otherwise every search past minconn reconnects and re-prepares
+            minconn = int(os.environ.get("DB_POOL_MIN", os.environ.get("GUNICORN_THREADS", 10)))
+            self._pool_args = dict(
+                minconn=minconn,
+                maxconn=max(minconn, int(os.environ.get("DB_POOL_MAX", 32))),
                 host=db_host,
                 database=db_name,
                 user=db_user,
-                password=db_pass
+                password=db_pass,
+                connection_factory=PreparedConnection
             )
-            print("Connected to Postgres")
+            self.pool = psycopg2.pool.ThreadedConnectionPool(**self._pool_args)
+            logger.info("Connected to Postgres")
         except Exception as e:
-            print(f"Failed to connect to Postgres: {e}")
-            self.db_conn = None
+            logger.error("Failed to connect to Postgres: %s", e)
+            self.pool = None
         
         # 2. Open RocksDB (Inverted Index) - Read Only
         rocksdb_path = os.environ.get("ROCKSDB_PATH", "/shared_data/search_index.db")
+        # Block cache size per process; capacity is an upper bound, not allocated up front
+        block_cache_mb = int(os.environ.get("ROCKSDB_BLOCK_CACHE_MB", 2048))
         self.index_db = None
         
         if ROCKSDB_AVAILABLE:
             try:
                 # We only need read access
-                self.index_db = RocksDBReader(rocksdb_path)
-                print(f"Opened RocksDB at {rocksdb_path}")
+                index_db = RocksDBReader(rocksdb_path, block_cache_mb)
+                # A value in another posting list format can still pass the size check,
+                # so only read an index the indexer has stamped with the current format
+                index_format = index_db.get(INDEX_FORMAT_KEY)
+                if index_format != INDEX_FORMAT_VERSION:
+                    index_db.close()
+                    raise ValueError(f"index format is {index_format!r}, expected {INDEX_FORMAT_VERSION!r}; rebuild the index")
+                self.index_db = index_db
+                logger.info("Opened RocksDB at %s", rocksdb_path)
             except Exception as e:
-                print(f"Failed to open RocksDB: {e}")
+                logger.error("Failed to open RocksDB: %s", e)
         
-        # Mock Index for fallback
+        # Mock Index for fallback: token -> [(doc_id, doc_length)]
         self.mock_index = {
-            "computer": "1,2",
-            "cats": "3,4"
+            "computer": [(1, 120), (2, 80)],
+            "cats": [(3, 100), (4, 100)]
         }
+
+        # Posting list cache: token -> (doc_ids, doc_lengths, idf)
+        # The RocksDB handle is read-only, a snapshot taken at open, so entries never go stale
+        cache_size = int(os.environ.get("POSTING_CACHE_SIZE", 50000))
+        self._post_cache = PostingCache(cache_size)
         
         # 3. Load Global Stats (avgdl, total_docs)
-        self.avgdl = self._calculate_avgdl()
-        self.total_docs = self._get_total_docs()
-        print(f"Ranker initialized. AvgDL: {self.avgdl}, Total Docs: {self.total_docs}")
+        # The indexer keeps these in RocksDB; the Postgres aggregates are only a fallback
+        stats = self._load_index_stats()
+        if stats:
+            self.avgdl, self.total_docs = stats
+        else:
+            self.avgdl, self.total_docs = self._load_db_stats()
 
-    def _calculate_avgdl(self):
-        if not self.db_conn:
-            return 100.0 # Default if DB not connected
+        # 4. Optionally hold the whole index in memory (see TermTable) when it fits in RAM.
+        # Under gunicorn --preload it is built once in the master and shared copy-on-write.
+        self.term_table = None
+        if self.index_db and os.environ.get("RANKER_PRELOAD_INDEX", "").lower() in ("1", "true", "yes"):
+            self.term_table = self._load_term_table()
+
+        logger.info("Ranker initialized. AvgDL: %s, Total Docs: %s", self.avgdl, self.total_docs)
+
+    @contextmanager
+    def _conn(self):
+        """Checks a connection out of the pool and returns it when done."""
+        if self._pool_pid != os.getpid():
+            self._reopen_pool()
+        c = self.pool.getconn()
         try:
-            with self.db_conn.cursor() as cur:
-                cur.execute("SELECT AVG(doc_length) FROM documents")
-                avg = cur.fetchone()[0]
-                return float(avg) if avg else 100.0 #Default to 100 to avoid dividing by 0 
+            yield c
+        finally:
+            self.pool.putconn(c)
+
+    def _reopen_pool(self):
+        """
+        Gives a forked process (e.g. a gunicorn worker under --preload) its own pool.
+        libpq sockets inherited from the parent must not be used by the child.
+        """
+        with self._pool_lock:
+            if self._pool_pid != os.getpid():
+                self.pool = psycopg2.pool.ThreadedConnectionPool(**self._pool_args)
+                self._pool_pid = os.getpid()
+
+    def release_pool(self):
+        """
+        Closes this process's pooled connections before forking workers.
+        Forked children open their own pool on first use (see _reopen_pool).
+        """
+        if self.pool and not self.pool.closed:
+            self.pool.closeall()
+
+    def _load_index_stats(self):
+        """
+        Reads the corpus stats the indexer stores in RocksDB.
+        Returns a tuple (avgdl, total_docs), or None if they are unavailable.
+        """
+        if not self.index_db:
+            return None
+        try:
+            avgdl = self.index_db.get(STATS_AVGDL_KEY)
+            total_docs = self.index_db.get(STATS_TOTAL_DOCS_KEY)
+            if not avgdl or not total_docs:
+                return None
+            return float(avgdl) or 100.0, int(total_docs) # Default to 100 to avoid dividing by 0
         except Exception as e:
-            print(f"Error calculating avgdl: {e}")
-            return 100.0
+            logger.error("Error reading index stats: %s", e)
+            return None
 
-    def _get_total_docs(self):
-        if not self.db_conn:
-            return 1000 # Default
+    def _load_db_stats(self):
+        """
+        Computes (avgdl, total_docs) from Postgres in a single round-trip.
+        """
+        if not self.pool:
+            return 100.0, 1000 # Default if DB not connected
         try:
-            with self.db_conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM documents")
-                count = cur.fetchone()[0]
-                return int(count) if count else 0
+            with self._conn() as c, c.cursor() as cur:
+                cur.execute("SELECT AVG(doc_length), COUNT(*) FROM documents")
+                avg, count = cur.fetchone()
+                avgdl = float(avg) if avg else 100.0 #Default to 100 to avoid dividing by 0 
+                return avgdl, int(count) if count else 0
         except Exception as e:
-            print(f"Error fetching total docs: {e}")
-            return 1000
+            logger.error("Error fetching corpus stats: %s", e)
+            return 100.0, 1000
 
-    def _get_doc_lengths(self, doc_ids):
+    def _decode_posting(self, val):
         """
-        Fetches document lengths for a list of doc_ids.
-        Returns a dictionary: {doc_id: length}
+        Parses a posting list value from RocksDB.
+        Returns a tuple: (doc_ids ndarray, doc_lengths ndarray, idf)
+        Raises ValueError if the value is not a well-formed posting list.
+        The IDF uses the current corpus size, computed once per decode rather than per query.
         """
-        if not self.db_conn or not doc_ids:
-            return {}
-        
-        lengths = {}
+        if not val:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), 0.0
+        # Decode straight from the value bytes; one cumsum restores absolute doc_ids
+        postings = posting_records(val)
+        doc_ids = np.cumsum(postings['doc_id_delta'], dtype=np.int64)
+        doc_lengths = postings['doc_length'].astype(np.float64)
+        return doc_ids, doc_lengths, bm25_idf(self.total_docs, doc_ids.size)
+
+    def _load_term_table(self):
+        """
+        Builds a TermTable from every posting list in RocksDB. The first scan sizes the
+        table and the second decodes each value straight into it, so at most one raw
+        value is held at a time.
+        Returns None if a scan fails; lookups then go through RocksDB as usual.
+        """
+        capacity = [0, 0] # terms, postings
+        def count(key, val):
+            if not key.startswith(STATS_KEY_PREFIX):
+                capacity[0] += 1
+                capacity[1] += len(val) // POSTING_DTYPE.itemsize
+
+        def fill(key, val):
+            if key.startswith(STATS_KEY_PREFIX):
+                return
+            try:
+                postings = posting_records(val)
+            except ValueError as e:
+                logger.error("Error decoding token %s: %s", key.decode('utf-8', 'replace'), e)
+                return
+            table.add(key.decode('utf-8'), postings, bm25_idf(self.total_docs, len(postings)))
+
         try:
-            with self.db_conn.cursor() as cur:
-                # Use tuple(doc_ids) for SQL IN clause
-                # Handle single item tuple correctly
-                if len(doc_ids) == 1:
-                    query = "SELECT id, doc_length FROM documents WHERE id = %s"
-                    params = (doc_ids[0],)
-                else:
-                    query = "SELECT id, doc_length FROM documents WHERE id IN %s"
-                    params = (tuple(doc_ids),)
-                
-                cur.execute(query, params)
-                rows = cur.fetchall()
-                for r in rows:
-                    lengths[r[0]] = r[1]
+            self.index_db.scan(count)
+            table = TermTable(*capacity)
+            self.index_db.scan(fill)
         except Exception as e:
-            print(f"Error fetching doc lengths: {e}")
-        return lengths
+            logger.error("Error preloading index: %s", e)
+            return None
+        table.freeze()
+        logger.info("Preloaded %d terms (%d postings) into memory", len(table), table.doc_ids.size)
+        return table
+
+    def _mock_posting(self, token):
+        """Builds a posting list tuple from the mock index."""
+        mock = self.mock_index.get(token, [])
+        doc_ids = np.array([d for d, _ in mock], dtype=np.int64)
+        doc_lengths = np.array([l for _, l in mock], dtype=np.float64)
+        return doc_ids, doc_lengths, bm25_idf(self.total_docs, len(mock))
+
+    def _load_postings(self, tokens):
+        """
+        Fetches posting lists for distinct tokens. Tokens in the preloaded term table
+        are sliced from it; cache misses for the rest are read from RocksDB in a
+        single MultiGet.
+        Returns a dictionary: {token: (doc_ids ndarray, doc_lengths ndarray, idf)}
+        """
+        postings = {}
+        misses = []
+        for token in tokens:
+            if self.term_table is not None:
+                entry = self.term_table.get(token)
+                if entry is not None:
+                    postings[token] = entry
+                    continue
+            cached = self._post_cache.get(token)
+            if cached is None:
+                misses.append(token)
+            else:
+                postings[token] = cached
+
+        if not misses:
+            return postings
+
+        if self.index_db:
+            try:
+                values = self.index_db.multi_get([t.encode('utf-8') for t in misses])
+            except Exception as e:
+                logger.error("Error fetching tokens %s: %s", misses, e)
+                return postings
+            loaded = []
+            for token, val in zip(misses, values):
+                try:
+                    loaded.append((token, self._decode_posting(val)))
+                except ValueError as e:
+                    # Treat the token as missing rather than failing the whole search
+                    logger.error("Error decoding token %s: %s", token, e)
+        else:
+            # Fallback to mock
+            loaded = [(token, self._mock_posting(token)) for token in misses]
+
+        for token, entry in loaded:
+            # Shared between requests via the cache
+            entry[0].setflags(write=False)
+            entry[1].setflags(write=False)
+            self._post_cache.put(token, entry)
+            postings[token] = entry
+        return postings
 
     def search(self, query, k=10):
         """
         Performs BM25 search for the given query.
         Returns top k results: [{'url': ..., 'title': ..., 'score': ...}]
         """
-        # Preprocessing to match Indexer:
-        # 1. Lowercase
-        # 2. Remove non-alphanumeric (keep spaces)
-        # 3. Split by whitespace
-        # 4. Filter length >= 3
-        
-        query_clean = re.sub(r'[^a-z0-9\s]', '', query.lower())
-        tokens = [t for t in query_clean.split() if len(t) >= 3]
-        
-        if not tokens:
-            return []
+        return self.search_batch([query], k)[0]
 
-        # BM25 Constants
-        k1 = 1.5
-        b = 0.75
-        
-        # Accumulate scores: doc_id -> score
-        scores = defaultdict(float)
-        
-        # 1. Retrieve all posting lists and candidate docs
-        token_postings = {} # token -> [doc_ids]
-        candidate_doc_ids = set()
+    def search_batch(self, queries, k=10):
+        """
+        Performs BM25 search for several queries at once. The posting list fetch,
+        the doc slot mapping and the metadata query are shared by all of them.
+        Returns one list of top k results per query, in the same order.
+        """
+        query_tokens = [tokenize_query(q) for q in queries]
+        all_tokens = dict.fromkeys(t for tokens in query_tokens for t in tokens)
 
-        for token in tokens:
-            # A. Get Posting List from RocksDB or Mock
-            postings_str = None
-            
-            if self.index_db:
-                try:
-                    val = self.index_db.get(token.encode('utf-8'))
-                    if val:
-                        postings_str = val.decode('utf-8')
-                except Exception as e:
-                    print(f"Error fetching token {token}: {e}")
-            else:
-                # Fallback to mock
-                postings_str = self.mock_index.get(token)
+        if not all_tokens:
+            return [[] for _ in queries]
 
-            if not postings_str:
-                continue
-                
-            # Format: "doc_id1,doc_id2,..." (Simplified for now, ideally should have TF)
-            # For this phase, we assume TF=1 for all occurrences in the simplified index
-            if isinstance(postings_str, bytes):
-                postings_str = postings_str.decode('utf-8')
-            
-            doc_ids = [int(d) for d in postings_str.split(',')]
-            token_postings[token] = doc_ids
-            candidate_doc_ids.update(doc_ids)
-
-        if not candidate_doc_ids:
-            return []
-
-        # 2. Batch fetch document lengths
-        doc_lengths = self._get_doc_lengths(list(candidate_doc_ids))
-
-        # 3. Calculate BM25 Scores
-        for token in tokens:
-            doc_ids = token_postings.get(token, [])
-            if not doc_ids:
+        # 1. Retrieve all posting lists (cache first, then one MultiGet for the rest)
+        # For this phase, we assume TF=1 for all occurrences in the simplified index
+        token_postings = {
+            token: entry
+            for token, entry in self._load_postings(all_tokens).items()
+            if entry[0].size > 0
+        } # token -> (doc_ids, doc_lengths, idf)
+
+        if not token_postings:
+            return [[] for _ in queries]
+
+        # 2. Map every candidate doc to a slot in the score matrix.
+        # np.unique does the id -> slot mapping in C, with no per-posting Python objects
+        fetched = list(token_postings)
+        fetched_ids = np.concatenate([token_postings[t][0] for t in fetched])
+        all_docs, slots = np.unique(fetched_ids, return_inverse=True)
+        bounds = np.cumsum([token_postings[t][0].size for t in fetched])[:-1]
+        token_idx = dict(zip(fetched, np.split(slots, bounds))) # token -> slots of its postings
+
+        # Document lengths come from the postings themselves (no Postgres round-trip)
+        lens_vec = np.zeros(len(all_docs), dtype=np.float64)
+        lens_vec[slots] = np.concatenate([token_postings[t][1] for t in fetched])
+        # Fallback to avgdl if the indexer has not recorded a length
+        lens_vec[lens_vec == 0] = self.avgdl
+
+        # 3. Calculate BM25 Scores one query at a time into a single reused buffer.
+        # Selection and reset only touch the query's own docs, so a query costs
+        # O(its postings) however many other docs the batch brought in
+        scores = np.zeros(len(all_docs), dtype=np.float64)
+        ranked = []
+        for tokens in query_tokens:
+            # Flatten the query's postings so the kernel sees all tokens in one call
+            scored = [t for t in tokens if t in token_postings]
+            if not scored:
+                ranked.append([])
                 continue
+            token_offsets = np.zeros(len(scored) + 1, dtype=np.int64)
+            token_offsets[1:] = np.cumsum([token_idx[t].size for t in scored])
+            posting_idx_flat = np.concatenate([token_idx[t] for t in scored]).astype(np.int64, copy=False)
+            idfs = np.array([token_postings[t][2] for t in scored], dtype=np.float64)
 
-            # Calculate IDF
-            # IDF(q_i) = log( (N - n(q_i) + 0.5) / (n(q_i) + 0.5) + 1 )
-            N = self.total_docs
-            if N == 0: N = 1 # Avoid division by zero issues if DB is empty
-            
-            n_qi = len(doc_ids)
-            idf = np.log((N - n_qi + 0.5) / (n_qi + 0.5) + 1)
-            
-            for doc_id in doc_ids:
-                # TODO: Fetch real TF from index. Currently index only stores doc_ids.
-                # We assume TF=1 for now.
-                tf = 1 
-                
-                # Get doc_len, fallback to avgdl if missing (e.g. sync issue)
-                doc_len = doc_lengths.get(doc_id, self.avgdl)
-                if doc_len is None or doc_len == 0:
-                    doc_len = self.avgdl # Safety fallback
-                
-                # BM25 Score for this term
-                numerator = idf * tf * (k1 + 1)
-                denominator = tf + k1 * (1 - b + b * (doc_len / self.avgdl))
-                scores[doc_id] += numerator / denominator
-
-        # Sort by score
-        sorted_docs = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
-        
-        # Fetch Metadata for top results
+            # TODO: Fetch real TF from index. Currently index only stores doc_ids and lengths.
+            bm25_kernel(token_offsets, posting_idx_flat, idfs, lens_vec, float(self.avgdl), K1, B, scores)
+            # Slots this query scored. Sort + dedupe rather than np.unique, whose
+            # hash-based path is far slower for these arrays
+            cand = np.sort(posting_idx_flat)
+            cand = cand[np.concatenate(([True], cand[1:] != cand[:-1]))]
+            cand_scores = scores[cand]
+            scores[cand] = 0.0 # leave the buffer zeroed for the next query
+
+            # Select top k in O(N), then sort only the survivors
+            if cand.size > k:
+                top = np.argpartition(-cand_scores, k)[:k]
+            else:
+                top = np.arange(cand.size)
+            top = top[np.argsort(-cand_scores[top], kind='stable')]
+            ranked.append(list(zip(all_docs[cand[top]].tolist(), cand_scores[top].tolist())))
+
+        # 4. Fetch Metadata for the top results of every query in one query
+        if self.pool:
+            top_doc_ids = list(dict.fromkeys(doc_id for sorted_docs in ranked for doc_id, _ in sorted_docs))
+            meta_map = self._fetch_metadata(top_doc_ids)
+        else:
+            meta_map = None
+        return [self._format_results(sorted_docs, meta_map) for sorted_docs in ranked]
+
+    def _fetch_metadata(self, doc_ids):
+        """
+        Fetches url, title and snippet for a list of doc_ids.
+        Returns a dictionary: {doc_id: {'url': ..., 'title': ..., 'snippet': ...}}
+        """
+        if not doc_ids:
+            return {}
+        try:
+            with self._conn() as c, c.cursor() as cur:
+                # Fetch all metadata in one query via the statement prepared on this
+                # connection (see PreparedConnection); psycopg2 adapts the list to an array
+                cur.execute("EXECUTE get_meta(%s::int[])", (doc_ids,))
+                rows = cur.fetchall()
+                # Create a lookup map (rows come back unordered; rank order comes from the caller)
+                return {r[0]: {'url': r[1], 'title': r[2], 'snippet': r[3]} for r in rows}
+        except Exception as e:
+            logger.error("Error fetching metadata: %s", e)
+            return {}
+
+    def _format_results(self, sorted_docs, meta_map):
+        """
+        Builds the response entries for ranked (doc_id, score) pairs.
+        meta_map is None when the DB is unavailable, which yields mock entries.
+        """
         results = []
-        if self.db_conn and sorted_docs:
-            try:
-                top_doc_ids = [doc_id for doc_id, _ in sorted_docs]
-                with self.db_conn.cursor() as cur:
-                    # Fetch all metadata in one query
-                    if len(top_doc_ids) == 1:
-                        query = "SELECT id, url, title, snippet FROM documents WHERE id = %s"
-                        params = (top_doc_ids[0],)
-                    else:
-                        query = "SELECT id, url, title, snippet FROM documents WHERE id IN %s"
-                        params = (tuple(top_doc_ids),)
-                    
-                    cur.execute(query, params)
-                    rows = cur.fetchall()
-                    
-                    # Create a lookup map
-                    meta_map = {r[0]: {'url': r[1], 'title': r[2], 'snippet': r[3]} for r in rows}
-                    
-                    for doc_id, score in sorted_docs:
-                        if doc_id in meta_map:
-                            meta = meta_map[doc_id]
-                            results.append({
-                                "id": doc_id,
-                                "url": meta['url'],
-                                "score": score,
-                                "title": meta['title'] if meta['title'] else meta['url'], # Fallback to URL if title is missing
-                                "snippet": meta['snippet'] if meta['snippet'] else "No preview available."
-                            })
-            except Exception as e:
-                print(f"Error fetching metadata: {e}")
+        if meta_map is not None:
+            for doc_id, score in sorted_docs:
+                if doc_id in meta_map:
+                    meta = meta_map[doc_id]
+                    results.append({
+                        "id": doc_id,
+                        "url": meta['url'],
+                        "score": score,
+                        "title": meta['title'] if meta['title'] else meta['url'], # Fallback to URL if title is missing
+                        "snippet": meta['snippet'] if meta['snippet'] else "No preview available."
+                    })
         else:
-            # Fallback if DB is down or no results
+            # Fallback if DB is down
             for doc_id, score in sorted_docs:
                 results.append({
                     "id": doc_id,
@@ -245,28 +612,28 @@ class Ranker:
                     "title": f"Mock Document {doc_id}",
                     "snippet": "This is a mock snippet because the DB is unavailable."
                 })
-                    
         return results
 
     def close(self):
-        """Closes the database connection."""
+        """Closes the RocksDB handle and all pooled Postgres connections."""
         if self.index_db:
             try:
                 self.index_db.close()
-                print("Closed RocksDB connection")
+                logger.info("Closed RocksDB connection")
             except Exception as e:
-                print(f"Error closing RocksDB connection: {e}")
+                logger.error("Error closing RocksDB connection: %s", e)
             finally:
                 self.index_db = None
 
-        if self.db_conn:
+        if self.pool:
             try:
-                self.db_conn.close()
-                print("Closed Postgres connection")
+                if not self.pool.closed:
+                    self.pool.closeall()
+                logger.info("Closed Postgres connection pool")
             except Exception as e:
-                print(f"Error closing Postgres connection: {e}")
+                logger.error("Error closing Postgres connection pool: %s", e)
             finally:
-                self.db_conn = None
+                self.pool = None
 
     def __enter__(self):
         return self
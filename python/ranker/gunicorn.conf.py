@@ -0,0 +1,26 @@
+import os
+
+# Search is I/O bound (RocksDB reads, Postgres round-trips), so threaded workers multiplex it well
+bind = "0.0.0.0:5000"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 10))
+
+# Build the Ranker once in the master; workers share its memory copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master before workers are forked: drop its Postgres connections
+    # so no worker inherits them. Each worker opens its own pool on first use.
+    import app
+    if app._ranker:
+        app._ranker.release_pool()
+
+
+def post_fork(server, worker):
+    # The log listener thread started at import stays behind in the master
+    import app
+    app.start_log_listener()
+    # Runs on the worker's main thread, before any request thread can start it
+    app.start_parallel_runtime()
@@ -1,7 +1,14 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 #include <rocksdb/db.h>
+#include <rocksdb/cache.h>
+#include <rocksdb/filter_policy.h>
+#include <rocksdb/table.h>
+#include <memory>
+#include <mutex>
+#include <shared_mutex>
 #include <string>
+#include <vector>
 #include <stdexcept>
 
 namespace py = pybind11;
@@ -9,9 +16,28 @@ namespace py = pybind11;
 class RocksDBReader {
     rocksdb::DB* db;
     bool is_open;
+    // Reads run without the GIL, so close() must wait for them: reads hold it shared
+    // until their pinned values are copied out, close() takes it exclusively
+    std::shared_mutex db_mutex;
+
+    void release_db() {
+        if (is_open && db) {
+            delete db;
+            db = nullptr;
+            is_open = false;
+        }
+    }
 public:
-    RocksDBReader(const std::string& path) : db(nullptr), is_open(false) {
+    RocksDBReader(const std::string& path, size_t block_cache_mb) : db(nullptr), is_open(false) {
         rocksdb::Options options;
+        // Every lookup is a point get by term: bloom filters skip SSTs that cannot hold
+        // the key, and a large block cache keeps hot posting lists in memory
+        rocksdb::BlockBasedTableOptions table_options;
+        table_options.filter_policy.reset(rocksdb::NewBloomFilterPolicy(10));
+        table_options.block_cache = rocksdb::NewLRUCache(block_cache_mb * 1024 * 1024);
+        options.table_factory.reset(rocksdb::NewBlockBasedTableFactory(table_options));
+        // Keep every SST open so gets never go through table-cache eviction
+        options.max_open_files = -1;
         // Use default comparator (Bytewise)
         rocksdb::Status status = rocksdb::DB::OpenForReadOnly(options, path, &db);
         if (!status.ok()) {
@@ -21,15 +47,32 @@ public:
     }
 
     ~RocksDBReader() {
-        close();
+        // No other reference to this object remains, so no read can be in flight
+        release_db();
     }
 
     py::object get(const py::bytes& key) {
-        if (!is_open) return py::none();
-        
-        std::string key_str = key;
-        std::string value;
-        rocksdb::Status status = db->Get(rocksdb::ReadOptions(), key_str, &value);
+        // Borrow the key bytes instead of copying them into a std::string
+        char* key_data;
+        Py_ssize_t key_len;
+        PyBytes_AsStringAndSize(key.ptr(), &key_data, &key_len);
+
+        // Declared before the value so the pin is released before the lock is
+        std::shared_lock<std::shared_mutex> lock(db_mutex, std::defer_lock);
+        // PinnableSlice points straight into the block cache when it can, so the
+        // only copy of the value is the one into the returned bytes object
+        rocksdb::PinnableSlice value;
+        rocksdb::Status status;
+        {
+            py::gil_scoped_release release; // Let other request threads run during the read
+            lock.lock();
+            if (!is_open) {
+                status = rocksdb::Status::NotFound();
+            } else {
+                status = db->Get(rocksdb::ReadOptions(), db->DefaultColumnFamily(),
+                                 rocksdb::Slice(key_data, key_len), &value);
+            }
+        }
         
         if (status.IsNotFound()) {
             return py::none();
@@ -37,21 +80,76 @@ public:
         if (!status.ok()) {
             throw std::runtime_error("Error reading key: " + status.ToString());
         }
-        return py::bytes(value);
+        return py::bytes(value.data(), value.size());
     }
     
-    void close() {
-        if (is_open && db) {
-            delete db;
-            db = nullptr;
-            is_open = false;
+    // Batched point lookups: one MultiGet amortises locking and block-cache lookups
+    // across all keys. Returns a list aligned with keys (None where not found).
+    py::list multi_get(const std::vector<std::string>& keys) {
+        py::list result;
+        std::shared_lock<std::shared_mutex> lock(db_mutex, std::defer_lock);
+        std::vector<rocksdb::Slice> key_slices(keys.begin(), keys.end());
+        std::vector<rocksdb::PinnableSlice> values(keys.size());
+        std::vector<rocksdb::Status> statuses(keys.size(), rocksdb::Status::NotFound());
+        {
+            py::gil_scoped_release release;
+            lock.lock();
+            if (is_open) {
+                db->MultiGet(rocksdb::ReadOptions(), db->DefaultColumnFamily(), keys.size(),
+                             key_slices.data(), values.data(), statuses.data());
+            }
+        }
+
+        for (size_t i = 0; i < keys.size(); ++i) {
+            if (statuses[i].IsNotFound()) {
+                result.append(py::none());
+            } else if (!statuses[i].ok()) {
+                throw std::runtime_error("Error reading key: " + statuses[i].ToString());
+            } else {
+                result.append(py::bytes(values[i].data(), values[i].size()));
+            }
+        }
+        return result;
+    }
+    
+    // Full scan of the index in key order, for callers that keep it in memory.
+    // Calls callback(key, value) once per entry, so only the current value is
+    // held in Python at a time.
+    void scan(const py::function& callback) {
+        std::shared_lock<std::shared_mutex> lock(db_mutex, std::defer_lock);
+        {
+            py::gil_scoped_release release;
+            lock.lock();
         }
+        if (!is_open) return;
+
+        rocksdb::ReadOptions read_options;
+        // A one-off sequential pass: don't evict hot point-lookup blocks for it
+        read_options.fill_cache = false;
+        std::unique_ptr<rocksdb::Iterator> it(db->NewIterator(read_options));
+        for (it->SeekToFirst(); it->Valid(); it->Next()) {
+            rocksdb::Slice key = it->key();
+            rocksdb::Slice value = it->value();
+            callback(py::bytes(key.data(), key.size()), py::bytes(value.data(), value.size()));
+        }
+        if (!it->status().ok()) {
+            throw std::runtime_error("Error scanning index: " + it->status().ToString());
+        }
+    }
+
+    void close() {
+        // Drop the GIL first: a read holding the lock may be waiting for it
+        py::gil_scoped_release release;
+        std::unique_lock<std::shared_mutex> lock(db_mutex);
+        release_db();
     }
 };
 
 PYBIND11_MODULE(rocksdb_client, m) {
     py::class_<RocksDBReader>(m, "RocksDBReader")
-        .def(py::init<const std::string&>())
+        .def(py::init<const std::string&, size_t>(), py::arg("path"), py::arg("block_cache_mb") = 2048)
         .def("get", &RocksDBReader::get)
+        .def("multi_get", &RocksDBReader::multi_get)
+        .def("scan", &RocksDBReader::scan)
         .def("close", &RocksDBReader::close);
 }